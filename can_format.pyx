@@ -0,0 +1,68 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""Formatter per-message biên dịch bằng Cython (tùy chọn).
+
+Bản tăng tốc của đường format chuỗi nóng nhất trong
+CanWorker._format_message: hex data viết thẳng vào buffer C thay vì join
+các chuỗi tra bảng. main_can_analyzer import module này với try/except —
+thiếu extension thì dùng bản Python thuần, GUI vẫn chạy bình thường.
+
+Build:  python setup.py build_ext --inplace
+"""
+
+cdef const char* _HEX_UPPER = "0123456789ABCDEF"
+
+# CAN FD tối đa 64 byte data
+DEF _MAX_DATA = 64
+
+
+def format_row(double ts, unsigned int aid, const unsigned char[:] data,
+               int dlc, bint ext, bint rtr, bint err, bint fd, bint brs,
+               str bus_str, unsigned long long count):
+    """Trả về (hàng bảng 7 chuỗi, hàng log 8 trường) cho một frame.
+
+    Cùng đầu ra với nhánh Python thuần trong CanWorker._format_message.
+    """
+    cdef unsigned char b
+    cdef int i, n
+    cdef char spaced[3 * _MAX_DATA]
+    cdef char packed[2 * _MAX_DATA]
+    cdef str timestamp_str, id_hex, id_str, msg_type, data_str, log_data
+
+    n = data.shape[0]
+    if n > _MAX_DATA:
+        n = _MAX_DATA
+    for i in range(n):
+        b = data[i]
+        spaced[3 * i] = _HEX_UPPER[b >> 4]
+        spaced[3 * i + 1] = _HEX_UPPER[b & 0xF]
+        spaced[3 * i + 2] = 32  # ' '
+        packed[2 * i] = _HEX_UPPER[b >> 4]
+        packed[2 * i + 1] = _HEX_UPPER[b & 0xF]
+
+    timestamp_str = "%.6f" % ts
+    id_hex = "%X" % aid
+    id_str = id_hex + (" (Ext)" if ext else " (Std)")
+
+    if rtr:
+        msg_type = "Remote"
+        data_str = "N/A"
+        log_data = "N/A"
+    elif err:
+        msg_type = "Error"
+        data_str = "Error Data: " + (<bytes>packed[:2 * n]).decode('ascii')
+        log_data = data_str.replace(" ", "")
+    elif fd:
+        msg_type = "FD BRS " if brs else "FD "
+        data_str = (<bytes>spaced[:3 * n - 1]).decode('ascii') if n else ""
+        log_data = (<bytes>packed[:2 * n]).decode('ascii')
+    else:
+        msg_type = "Data"
+        data_str = (<bytes>spaced[:3 * n - 1]).decode('ascii') if n else ""
+        log_data = (<bytes>packed[:2 * n]).decode('ascii')
+
+    row = (timestamp_str, id_str, msg_type, str(dlc), data_str,
+           str(count), bus_str)
+    log_row = (timestamp_str, id_hex,
+               "E" if ext else "S",
+               msg_type, dlc, log_data, count, bus_str)
+    return row, log_row
@@ -1,44 +1,122 @@
 import sys
 import os
 import csv
+import re
+import socket
 import threading
-import time
+from collections import deque
 from datetime import datetime
-from queue import Queue, Empty
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGroupBox,
-    QLabel, QLineEdit, QComboBox, QPushButton, QTableWidget, QTableWidgetItem,
+    QLabel, QLineEdit, QComboBox, QPushButton, QTableView,
     QMenuBar, QAction, QFileDialog, QMessageBox, QStatusBar, QHeaderView,
     QDialog, QFormLayout, QSpinBox, QGridLayout
 )
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QThread, QObject
+from PyQt5.QtCore import (
+    Qt, QTimer, pyqtSignal, QThread, QObject, QAbstractTableModel, QModelIndex
+)
 from PyQt5.QtGui import QColor
 
-import pyqtgraph as pg
+import numpy as np
 import can
-# import cantools # Bỏ comment nếu sử dụng DBC
+
+# pyqtgraph/cantools nặng — import lười để rút ngắn thời gian khởi động
+# và giảm RSS khi không dùng đến (xem _get_pyqtgraph/_get_cantools)
+
+# Extension Cython tùy chọn cho formatter per-message
+# (build bằng: python setup.py build_ext --inplace)
+try:
+    from can_format import format_row as _format_row_fast
+except ImportError:
+    _format_row_fast = None
 
 # --- Cấu hình cơ bản ---
 DEFAULT_INTERFACE = 'slcan' if os.name == 'nt' else 'socketcan' # 'slcan' cho Windows, 'socketcan' cho Linux
 DEFAULT_CHANNEL = 'COM3' if os.name == 'nt' else 'can0'       # Thay đổi nếu cần
 DEFAULT_BAUDRATE = 500000
 SUPPORTED_BAUDRATES = [125000, 250000, 500000, 1000000]
+DEFAULT_RX_BUFFER = 1 << 20 # bytes - SO_RCVBUF cho socketcan, chống tràn FIFO kernel
 PLOT_UPDATE_INTERVAL = 100 # ms - Tần suất cập nhật đồ thị
-MAX_PLOT_POINTS = 200      # Số điểm tối đa trên đồ thị
+MAX_PLOT_POINTS = 2000     # Số điểm tối đa trên đồ thị (downsampling lo phần vẽ)
+UI_UPDATE_INTERVAL = 50    # ms - Tần suất rút message từ queue và cập nhật GUI
+RX_QUEUE_MAXLEN = 50000    # Số message tối đa giữ trong queue của worker
+RX_BATCH_MAX = 500         # Số message tối đa xử lý mỗi lần tick
+MAX_ROWS = 10000           # Số hàng tối đa giữ trong bảng nhận
+PLOT_TARGET_ID = 0x18FF03EF # ID muốn vẽ đồ thị (byte 0) - thay đổi nếu cần
+
+# Bảng tra 256 chuỗi hex viết hoa — tránh bytes.hex() + .upper() (hai lần
+# cấp phát chuỗi) trên đường nhận per-message
+_HEX = [f"{b:02X}" for b in range(256)]
+
+# Regex biên dịch sẵn để bỏ khoảng trắng khi parse data gửi — quan trọng
+# nếu sau này triển khai gửi định kỳ (spinbox đang comment trong Send Area)
+_WS_RE = re.compile(r"\s+")
+
+# Formatter theo loại frame — mỗi hàm trả về (type_str, data_str).
+# Dispatch phẳng qua một biểu thức điều kiện thay cho chuỗi if/elif
+# trong thân hàm format per-message.
+def _fmt_data(msg):
+    return "Data", " ".join([_HEX[b] for b in msg.data])
+
+def _fmt_remote(msg):
+    return "Remote", "N/A"
+
+def _fmt_error(msg):
+    return "Error", "Error Data: " + "".join([_HEX[b] for b in msg.data]) # Có thể không có data thực
+
+def _fmt_fd(msg):
+    return f"FD {'BRS ' if msg.bitrate_switch else ''}", " ".join([_HEX[b] for b in msg.data])
+
+_pg = None
+
+def _get_pyqtgraph():
+    """Import pyqtgraph lần đầu khi cần và áp cấu hình toàn cục một lần.
+
+    Cấu hình được đặt ngay khi import, TRƯỚC khi bất kỳ widget đồ thị nào
+    được tạo: tắt antialias và chọn đường số học nhanh (setData luôn nhận
+    ndarray từ update_plots).
+    """
+    global _pg
+    if _pg is None:
+        import pyqtgraph as pg
+        pg.setConfigOptions(antialias=False, background='w', foreground='k')
+        for fast_opt in ({'useOpenGL': True, 'enableExperimental': True},
+                         {'useNumba': True}):
+            try:
+                pg.setConfigOptions(**fast_opt) # Không có trên pyqtgraph cũ / thiếu OpenGL
+            except Exception:
+                pass
+        _pg = pg
+    return _pg
+
+_cantools = None
+
+def _get_cantools():
+    """Import cantools khi cần (load file DBC), không trả phí lúc khởi động."""
+    global _cantools
+    if _cantools is None:
+        import cantools
+        _cantools = cantools
+    return _cantools
 
 # --- Worker đọc CAN chạy ngầm ---
 class CanWorker(QObject):
-    message_received = pyqtSignal(can.Message)
     error_occurred = pyqtSignal(str)
     _is_running = True
     _bus = None
-    _message_queue = None # Sử dụng queue nội bộ thay vì truyền từ ngoài vào
 
     def __init__(self, interface_config):
         super().__init__()
-        self.interface_config = interface_config
-        self._message_queue = Queue() # Tạo queue khi khởi tạo worker
+        # Copy và tách các key chỉ dành cho app, không truyền vào can.interface.Bus
+        self.interface_config = dict(interface_config)
+        self.rx_buffer_size = self.interface_config.pop('rx_buffer_size', 0)
+        # Queue nội bộ: append từ thread CAN, popleft từ thread GUI.
+        # deque.append/popleft là atomic dưới GIL nên không cần lock hay signal.
+        # Chứa tuple chuỗi đã format sẵn, không chứa can.Message.
+        self._rx_queue = deque(maxlen=RX_QUEUE_MAXLEN)
+        self._msg_count = 0
+        self._bus_lock = threading.Lock() # Bảo vệ send đồng thời từ nhiều thread
 
     def run(self):
         """Chạy vòng lặp đọc CAN."""
@@ -48,12 +126,23 @@ class CanWorker(QObject):
             self._bus = can.interface.Bus(**self.interface_config)
             print(f"Connected to {self._bus.channel_info}")
 
-            # Đẩy các message nhận được vào queue nội bộ
-            notifier = can.Notifier(self._bus, [self._message_listener])
-
+            # Nới SO_RCVBUF của socket kernel (chỉ socketcan có .socket) —
+            # thêm headroom trước khi FIFO kernel tràn ở tốc độ bus cao
+            if self.rx_buffer_size and hasattr(self._bus, 'socket'):
+                try:
+                    self._bus.socket.setsockopt(
+                        socket.SOL_SOCKET, socket.SO_RCVBUF, self.rx_buffer_size)
+                except OSError as e:
+                    print(f"Could not set SO_RCVBUF: {e}")
+
+            # Đọc blocking trực tiếp trên QThread — không cần Notifier (thread
+            # riêng) lẫn sleep; recv nhả GIL trong lúc chờ nên GUI chạy tự do.
+            # timeout để vòng lặp kiểm tra cờ dừng định kỳ.
             while self._is_running:
-                # Vòng lặp chờ notifier hoặc tín hiệu dừng
-                time.sleep(0.05) # Giảm tải CPU
+                msg = self._bus.recv(timeout=0.2)
+                if msg is not None:
+                    # Format ngay trên thread CAN; GUI chỉ rút tuple chuỗi theo lô
+                    self._rx_queue.append(self._format_message(msg))
 
         except can.CanError as e:
             print(f"CAN Error during connection/read: {e}")
@@ -62,8 +151,6 @@ class CanWorker(QObject):
             print(f"Unexpected error in CAN thread: {e}")
             self.error_occurred.emit(f"Error: {e}")
         finally:
-            if hasattr(self, 'notifier') and self.notifier:
-                 self.notifier.stop()
             if self._bus:
                 try:
                     self._bus.shutdown()
@@ -72,10 +159,60 @@ class CanWorker(QObject):
                     print(f"Error during CAN bus shutdown: {e}")
             self._is_running = False # Đảm bảo cờ được đặt lại
 
-    def _message_listener(self, msg):
-        """Callback được gọi bởi Notifier khi có message."""
-        if self._is_running:
-            self.message_received.emit(msg) # Phát tín hiệu trực tiếp
+    def _format_message(self, msg):
+        """Format một can.Message thành (hàng bảng, hàng log, mẫu plot).
+
+        Chạy trên thread CAN ngay sau recv, để thread GUI không phải làm
+        string/hex formatting per-message và không bao giờ chạm vào
+        can.Message.
+        """
+        self._msg_count += 1
+        count = self._msg_count
+
+        # Bind các thuộc tính msg vào local một lần — LOAD_FAST thay cho
+        # ~10 LOAD_ATTR per-frame, đáng kể ở tốc độ bus cao
+        aid = msg.arbitration_id
+        data = msg.data
+        dlc = msg.dlc
+        ext = msg.is_extended_id
+        rtr = msg.is_remote_frame
+        ts = msg.timestamp
+
+        channel_info = msg.channel if msg.channel else self.interface_config.get('channel', 'N/A')
+        bus_str = str(channel_info)
+
+        if _format_row_fast is not None:
+            # Đường Cython: hex data viết thẳng vào buffer C
+            row, log_row = _format_row_fast(
+                ts, aid, data, dlc, ext, rtr,
+                msg.is_error_frame, msg.is_fd, msg.bitrate_switch,
+                bus_str, count)
+        else:
+            timestamp_str = f"{ts:.6f}"
+            id_hex = f"{aid:X}"
+            id_str = id_hex + (" (Ext)" if ext else " (Std)")
+
+            # Chọn formatter theo loại frame trong một biểu thức duy nhất;
+            # frame Data (trường hợp phổ biến) là nhánh cuối không rẽ thêm
+            fmt = (_fmt_remote if rtr else
+                   _fmt_error if msg.is_error_frame else
+                   _fmt_fd if msg.is_fd else
+                   _fmt_data)
+            msg_type, data_str = fmt(msg)
+
+            row = (timestamp_str, id_str, msg_type, str(dlc), data_str,
+                   str(count), bus_str)
+            log_row = (timestamp_str, id_hex,
+                       "E" if ext else "S",
+                       msg_type, dlc,
+                       data_str.replace(" ", ""), # Ghi hex liền mạch
+                       count, bus_str)
+
+        sample = None
+        if aid == PLOT_TARGET_ID and not rtr and dlc > 0:
+            sample = (aid, ts, data[0]) # Trục X là timestamp thật, Y là byte đầu tiên
+
+        return row, log_row, sample
 
     def stop(self):
         """Dừng worker."""
@@ -83,11 +220,18 @@ class CanWorker(QObject):
         self._is_running = False
         # Không cần join thread ở đây vì QThread sẽ quản lý
 
-    def send_message(self, msg):
-        """Gửi tin nhắn CAN."""
+    def send_now(self, msg):
+        """Gửi tin nhắn CAN trực tiếp, gọi được từ thread GUI.
+
+        Không đi qua queued signal: worker đang block trong recv nên slot
+        queued chỉ chạy giữa các lần recv (trễ tới cả timeout). bus.send
+        nhả GIL trong C nên không làm nghẽn thread RX; lock chống gửi
+        đồng thời từ nhiều thread.
+        """
         if self._bus and self._is_running:
             try:
-                self._bus.send(msg)
+                with self._bus_lock:
+                    self._bus.send(msg)
                 # print(f"Sent: {msg}") # Debug
                 return True
             except can.CanError as e:
@@ -95,6 +239,68 @@ class CanWorker(QObject):
                 return False
         return False
 
+    def send_message(self, msg):
+        """Slot gửi qua event loop — đường dự phòng có back-pressure."""
+        return self.send_now(msg)
+
+# --- Model cho bảng nhận ---
+class CanTableModel(QAbstractTableModel):
+    """Model cho bảng message nhận, lưu dữ liệu theo cột (SoA).
+
+    Mỗi cột là một list các chuỗi đã format sẵn, nên data() chỉ cần index —
+    không tạo QTableWidgetItem per-cell, chèn theo lô chỉ tốn một cặp
+    beginInsertRows/endInsertRows.
+    """
+    HEADERS = ["Timestamp", "ID", "Type", "DLC", "Data (Hex)", "Count", "Bus"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._columns = [[] for _ in range(len(self.HEADERS))]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns[0])
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self._columns[index.column()][index.row()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def append_batch(self, rows):
+        """Chèn một lô hàng (list các tuple 7 chuỗi) trong một lần."""
+        if not rows:
+            return
+        first = len(self._columns[0])
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        for col, values in zip(self._columns, zip(*rows)):
+            col.extend(values)
+        self.endInsertRows()
+
+        # Cắt phần đầu nếu vượt quá MAX_ROWS (một lần beginRemoveRows duy nhất).
+        # Cắt dư thêm RX_BATCH_MAX hàng để vài lô tiếp theo không phải
+        # remove gì cả — khấu hao chi phí remove/memmove thay vì trả nó
+        # mỗi tick khi bảng đã đầy.
+        overflow = len(self._columns[0]) - MAX_ROWS
+        if overflow > 0:
+            trim = min(overflow + RX_BATCH_MAX, len(self._columns[0]) - len(rows))
+            self.beginRemoveRows(QModelIndex(), 0, trim - 1)
+            for col in self._columns:
+                del col[:trim]
+            self.endRemoveRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._columns = [[] for _ in range(len(self.HEADERS))]
+        self.endResetModel()
+
+
 # --- Hộp thoại Cài đặt ---
 class SettingsDialog(QDialog):
     def __init__(self, current_settings, parent=None):
@@ -114,9 +320,15 @@ class SettingsDialog(QDialog):
         self.baudrate_combo.addItems([str(br) for br in SUPPORTED_BAUDRATES])
         self.baudrate_combo.setCurrentText(str(current_settings.get('bitrate', DEFAULT_BAUDRATE)))
 
+        self.rx_buffer_spin = QSpinBox()
+        self.rx_buffer_spin.setRange(0, 1 << 26) # 0 = giữ mặc định của kernel
+        self.rx_buffer_spin.setSingleStep(1 << 16)
+        self.rx_buffer_spin.setValue(current_settings.get('rx_buffer_size', DEFAULT_RX_BUFFER))
+
         layout.addRow("Interface:", self.interface_combo)
         layout.addRow("Channel:", self.channel_edit)
         layout.addRow("Baudrate:", self.baudrate_combo)
+        layout.addRow("RX Buffer (bytes):", self.rx_buffer_spin)
 
         # Nút OK và Cancel
         button_layout = QHBoxLayout()
@@ -135,7 +347,9 @@ class SettingsDialog(QDialog):
         return {
             'interface': self.interface_combo.currentText(),
             'channel': self.channel_edit.text(),
-            'bitrate': int(self.baudrate_combo.currentText())
+            'bitrate': int(self.baudrate_combo.currentText()),
+            'receive_own_messages': self.current_settings.get('receive_own_messages', False),
+            'rx_buffer_size': self.rx_buffer_spin.value()
             # Thêm các tham số khác nếu cần (fd, state, etc.)
         }
 
@@ -155,14 +369,21 @@ class MainWindow(QMainWindow):
         self.log_file = None
         self.csv_writer = None
         self.is_logging = False
-        self.message_counter = 0
-        self.plot_data_x = {} # Key: ID, Value: list of timestamps/counters
-        self.plot_data_y = {} # Key: ID, Value: list of data values
+        self._row_batch = [] # Các hàng đã format, chờ đẩy vào model theo lô
+        self._log_batch = [] # Các hàng CSV chờ ghi, flush theo lô mỗi tick
+        # Ring buffer numpy cấp phát sẵn cho mỗi ID — ghi đè theo vòng,
+        # không append/pop(0) trên list Python per-message
+        self.ring_x = {}      # Key: ID, Value: np.float64[MAX_PLOT_POINTS]
+        self.ring_y = {}      # Key: ID, Value: np.float64[MAX_PLOT_POINTS]
+        self.ring_idx = {}    # Key: ID, Value: tổng số điểm đã ghi (monotonic)
         self.plot_curves = {} # Key: ID, Value: PlotDataItem
+        self._plot_t0 = None  # Timestamp của điểm đầu tiên — trục X tính từ 0
         self.can_settings = {
             'interface': DEFAULT_INTERFACE,
             'channel': DEFAULT_CHANNEL,
             'bitrate': DEFAULT_BAUDRATE,
+            'receive_own_messages': False, # Không nhận lại frame tự gửi
+            'rx_buffer_size': DEFAULT_RX_BUFFER, # App-only, không truyền vào Bus
             # 'fd': False # Thêm nếu cần CAN FD
         }
         # self.db = None # Cho DBC
@@ -171,10 +392,9 @@ class MainWindow(QMainWindow):
         self._init_ui()
         self._connect_signals()
 
-        # Timer để cập nhật GUI từ queue (nếu dùng queue) hoặc xử lý tác vụ định kỳ
+        # Timer để rút message từ queue của worker theo lô và cập nhật GUI
         self.ui_update_timer = QTimer(self)
-        self.ui_update_timer.timeout.connect(self.update_plots) # Chỉ cập nhật plot định kỳ
-        # self.ui_update_timer.start(50) # Cập nhật 20 lần/giây
+        self.ui_update_timer.timeout.connect(self.drain_rx)
 
     def _init_ui(self):
         # --- Menu Bar ---
@@ -188,13 +408,13 @@ class MainWindow(QMainWindow):
         self.stop_log_action = QAction('Stop Logging', self)
         self.stop_log_action.setEnabled(False)
         # export_action = QAction('&Export Data...', self) # TBD
-        exit_action = QAction('&Exit', self)
+        self.exit_action = QAction('&Exit', self)
 
         file_menu.addAction(self.start_log_action)
         file_menu.addAction(self.stop_log_action)
         # file_menu.addAction(export_action)
         file_menu.addSeparator()
-        file_menu.addAction(exit_action)
+        file_menu.addAction(self.exit_action)
 
         # Settings Menu Actions
         self.connect_action = QAction('&Connect', self)
@@ -209,8 +429,8 @@ class MainWindow(QMainWindow):
         # settings_menu.addAction(load_dbc_action)
 
         # Help Menu Actions
-        about_action = QAction('&About', self)
-        help_menu.addAction(about_action)
+        self.about_action = QAction('&About', self)
+        help_menu.addAction(self.about_action)
 
         # --- Central Widget & Layout ---
         central_widget = QWidget()
@@ -218,12 +438,10 @@ class MainWindow(QMainWindow):
         main_layout = QVBoxLayout(central_widget)
 
         # --- Receive Area ---
-        self.receive_table = QTableWidget()
-        self.receive_table.setColumnCount(7) # Tăng cột cho Counter
-        self.receive_table.setHorizontalHeaderLabels([
-            "Timestamp", "ID", "Type", "DLC", "Data (Hex)", "Count", "Bus"
-        ])
-        self.receive_table.setEditTriggers(QTableWidget.NoEditTriggers) # Không cho sửa trực tiếp
+        self.can_model = CanTableModel(self)
+        self.receive_table = QTableView()
+        self.receive_table.setModel(self.can_model)
+        self.receive_table.setEditTriggers(QTableView.NoEditTriggers) # Không cho sửa trực tiếp
         self.receive_table.verticalHeader().setVisible(False) # Ẩn header dọc
         header = self.receive_table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.ResizeToContents) # Timestamp
@@ -266,10 +484,11 @@ class MainWindow(QMainWindow):
         main_layout.addWidget(send_group)
 
         # --- Plot Area ---
+        # PlotWidget được tạo lười trong _ensure_plot_widget khi có mẫu đầu
+        # tiên cần vẽ — pyqtgraph không bị import lúc khởi động
         plot_group = QGroupBox("Real-time Plot")
-        plot_layout = QVBoxLayout(plot_group)
-        self.plot_widget = pg.PlotWidget()
-        plot_layout.addWidget(self.plot_widget)
+        self.plot_layout = QVBoxLayout(plot_group)
+        self.plot_widget = None
         main_layout.addWidget(plot_group, stretch=1) # Cho plot ít không gian hơn table
 
         # --- Status Bar ---
@@ -277,12 +496,21 @@ class MainWindow(QMainWindow):
         self.setStatusBar(self.status_bar)
         self.status_bar.showMessage("Disconnected")
 
-        # --- Plotting Setup ---
-        self.plot_widget.setBackground('w')
+    def _ensure_plot_widget(self):
+        """Tạo PlotWidget lần đầu khi có dữ liệu cần vẽ (import pyqtgraph tại đây)."""
+        if self.plot_widget is not None:
+            return
+        pg = _get_pyqtgraph()
+        self.plot_widget = pg.PlotWidget()
+        self.plot_layout.addWidget(self.plot_widget)
         self.plot_widget.setLabel('left', 'Value')
-        self.plot_widget.setLabel('bottom', 'Time (Sequence)')
+        self.plot_widget.setLabel('bottom', 'Time (s)')
         self.plot_widget.showGrid(x=True, y=True)
         self.plot_widget.addLegend()
+        # Peak-downsampling + clip: arrayToQPath chỉ thấy số điểm theo bề rộng
+        # pixel và trong vùng nhìn thấy, thay vì toàn bộ ring mỗi tick
+        self.plot_widget.setDownsampling(auto=True, mode='peak')
+        self.plot_widget.setClipToView(True)
 
     def _connect_signals(self):
         # Menu Actions
@@ -291,8 +519,8 @@ class MainWindow(QMainWindow):
         self.configure_action.triggered.connect(self.configure_settings)
         self.start_log_action.triggered.connect(self.start_logging)
         self.stop_log_action.triggered.connect(self.stop_logging)
-        self.menuBar().findChildren(QAction)[-2].triggered.connect(self.show_about) # About action
-        self.menuBar().findChildren(QAction)[-4].triggered.connect(self.close) # Exit action
+        self.about_action.triggered.connect(self.show_about)
+        self.exit_action.triggered.connect(self.close)
 
         # Send Button
         self.send_button.clicked.connect(self.prepare_send_message)
@@ -320,9 +548,11 @@ class MainWindow(QMainWindow):
         self.can_worker.moveToThread(self.can_thread)
 
         # Kết nối tín hiệu/slot GIỮA CÁC THREAD
-        self.can_worker.message_received.connect(self.handle_message)
-        self.can_worker.error_occurred.connect(self.handle_can_error)
-        self.send_request.connect(self.can_worker.send_message) # Tín hiệu gửi từ main -> worker
+        # (message nhận được đi qua _rx_queue, không qua signal)
+        # QueuedConnection tường minh: không bao giờ gọi slot trực tiếp
+        # xuyên thread dù sender/receiver có tình cờ cùng thread affinity
+        self.can_worker.error_occurred.connect(self.handle_can_error, Qt.QueuedConnection)
+        self.send_request.connect(self.can_worker.send_message, Qt.QueuedConnection) # Tín hiệu gửi từ main -> worker
         self.can_thread.started.connect(self.can_worker.run)
         self.can_thread.finished.connect(self.on_thread_finished) # Dọn dẹp khi thread kết thúc
 
@@ -333,8 +563,8 @@ class MainWindow(QMainWindow):
         self.is_connected = True # Giả định thành công, sẽ sửa nếu có lỗi ngay
         self.update_connection_status()
         self.status_bar.showMessage(f"Connecting to {self.can_settings['interface']}:{self.can_settings['channel']} @ {self.can_settings['bitrate']} bps...")
-        # Bật timer cập nhật plot
-        self.ui_update_timer.start(PLOT_UPDATE_INTERVAL)
+        # Bật timer rút message + cập nhật plot
+        self.ui_update_timer.start(UI_UPDATE_INTERVAL)
 
 
     def disconnect_can(self):
@@ -415,87 +645,101 @@ class MainWindow(QMainWindow):
 
 
     # --- Message Handling ---
-    def handle_message(self, msg):
-        """Xử lý tin nhắn CAN nhận được từ worker thread."""
-        self.message_counter += 1
-        timestamp_str = f"{msg.timestamp:.6f}" # Hoặc format theo datetime
-        # timestamp_dt = datetime.fromtimestamp(msg.timestamp)
-        # timestamp_str = timestamp_dt.strftime("%H:%M:%S.") + f"{timestamp_dt.microsecond // 1000:03d}"
-
-        id_str = f"{msg.arbitration_id:X}" # Hex format
-        if msg.is_extended_id:
-            id_str += " (Ext)"
-        else:
-            id_str += " (Std)"
-
-        if msg.is_remote_frame:
-            msg_type = "Remote"
-            data_str = "N/A"
-        elif msg.is_error_frame:
-            msg_type = "Error"
-            data_str = f"Error Data: {msg.data.hex().upper()}" # Có thể không có data thực
-        elif msg.is_fd: # CAN FD
-             msg_type = f"FD {'BRS ' if msg.bitrate_switch else ''}"
-             data_str = msg.data.hex(' ').upper()
-        else: # Standard CAN Data Frame
-            msg_type = "Data"
-            data_str = msg.data.hex(' ').upper()
-
-        dlc = msg.dlc
-        channel_info = msg.channel if msg.channel else self.can_settings.get('channel', 'N/A')
-
-        # --- Cập nhật bảng ---
-        row_position = self.receive_table.rowCount()
-        self.receive_table.insertRow(row_position)
-
-        self.receive_table.setItem(row_position, 0, QTableWidgetItem(timestamp_str))
-        self.receive_table.setItem(row_position, 1, QTableWidgetItem(id_str))
-        self.receive_table.setItem(row_position, 2, QTableWidgetItem(msg_type))
-        self.receive_table.setItem(row_position, 3, QTableWidgetItem(str(dlc)))
-        self.receive_table.setItem(row_position, 4, QTableWidgetItem(data_str))
-        self.receive_table.setItem(row_position, 5, QTableWidgetItem(str(self.message_counter)))
-        self.receive_table.setItem(row_position, 6, QTableWidgetItem(str(channel_info)))
+    def drain_rx(self):
+        """Rút message từ queue của worker theo lô và cập nhật GUI một lần.
 
-        # Tự cuộn xuống dòng mới nhất
-        self.receive_table.scrollToBottom()
+        Được gọi bởi ui_update_timer; gom tối đa RX_BATCH_MAX message mỗi tick
+        để tránh chi phí signal/repaint per-message ở tốc độ bus cao.
+        """
+        if self.can_worker is None:
+            return
 
-        # --- Ghi log ---
-        if self.is_logging and self.csv_writer:
+        # Cửa sổ bị ẩn/thu nhỏ: vẫn rút queue, ghi log và nạp ring đồ thị,
+        # nhưng bỏ qua việc chèn hàng vào bảng (không vẽ dữ liệu offscreen)
+        visible = self.isVisible() and not self.isMinimized()
+
+        q = self.can_worker._rx_queue
+        plot_batch = {} # Key: ID, Value: list các (x, y) trong tick này
+        n = 0
+        while q and n < RX_BATCH_MAX:
+            row, log_row, sample = q.popleft()
+            if visible:
+                self._row_batch.append(row)
+            if self.is_logging:
+                self._log_batch.append(log_row)
+            if sample is not None:
+                plot_batch.setdefault(sample[0], []).append(sample[1:])
+            n += 1
+
+        if plot_batch:
+            self._ingest_plot_batch(plot_batch)
+
+        if n:
+            # Đẩy cả lô vào model trong một lần chèn duy nhất
+            if self._row_batch:
+                # Chỉ tự cuộn khi người dùng đang ở cuối bảng (đang "theo dõi");
+                # kiểm tra trước khi chèn vì chèn làm thay đổi maximum
+                sb = self.receive_table.verticalScrollBar()
+                follow = sb.value() >= sb.maximum() - 4
+                self.can_model.append_batch(self._row_batch)
+                self._row_batch.clear()
+                if follow:
+                    sb.setValue(sb.maximum())
+            self._flush_log_batch()
+
+        self.update_plots()
+
+    def _flush_log_batch(self):
+        """Ghi cả lô hàng CSV đang chờ trong một lần writerows."""
+        if self.is_logging and self.csv_writer and self._log_batch:
             try:
-                self.csv_writer.writerow([
-                    timestamp_str,
-                    f"{msg.arbitration_id:X}",
-                    "E" if msg.is_extended_id else "S",
-                    msg_type,
-                    dlc,
-                    data_str.replace(" ", ""), # Ghi hex liền mạch
-                    self.message_counter,
-                    channel_info
-                ])
+                self.csv_writer.writerows(self._log_batch)
             except Exception as e:
                 print(f"Error writing to log file: {e}")
                 self.handle_can_error(f"Log Write Error: {e}") # Thông báo lỗi lên status bar
-
-
-        # --- Cập nhật dữ liệu cho đồ thị (thu thập dữ liệu) ---
-        # Ví dụ: Chỉ vẽ byte đầu tiên của ID 0x18FF03EF
-        target_id = 0x18FF03EF # Thay đổi ID bạn muốn vẽ
-        if msg.arbitration_id == target_id and not msg.is_remote_frame and msg.dlc > 0:
-             if target_id not in self.plot_data_x:
-                 self.plot_data_x[target_id] = []
-                 self.plot_data_y[target_id] = []
-                 # Tạo đường cong mới nếu chưa có
-                 pen_color = pg.mkPen(color=(len(self.plot_curves) % 9 * 30, len(self.plot_curves)*20 % 255, 255 - len(self.plot_curves)*10 % 255 ), width=2)
-                 self.plot_curves[target_id] = self.plot_widget.plot(pen=pen_color, name=f"ID {target_id:X} - Byte 0")
-
-             # Sử dụng bộ đếm làm trục X cho đơn giản
-             self.plot_data_x[target_id].append(self.message_counter)
-             self.plot_data_y[target_id].append(msg.data[0]) # Lấy byte đầu tiên
-
-             # Giới hạn số điểm để tránh lag
-             if len(self.plot_data_x[target_id]) > MAX_PLOT_POINTS:
-                 self.plot_data_x[target_id].pop(0)
-                 self.plot_data_y[target_id].pop(0)
+            self._log_batch.clear()
+
+    def _ingest_plot_batch(self, plot_batch):
+        """Ghi các mẫu plot gom theo ID vào ring buffer bằng ghi vector numpy.
+
+        Mỗi ID nhận cả lô (x, y) của tick bằng một/hai phép gán slice thay vì
+        k lần ghi scalar Python — chi phí per-sample được khấu hao theo cỡ lô.
+        """
+        self._ensure_plot_widget()
+        for target_id, samples in plot_batch.items():
+            if target_id not in self.ring_y:
+                self.ring_x[target_id] = np.empty(MAX_PLOT_POINTS, dtype=np.float64)
+                self.ring_y[target_id] = np.empty(MAX_PLOT_POINTS, dtype=np.float64)
+                self.ring_idx[target_id] = 0
+                # Tạo đường cong mới nếu chưa có
+                pg = _get_pyqtgraph()
+                pen_color = pg.mkPen(color=(len(self.plot_curves) % 9 * 30, len(self.plot_curves)*20 % 255, 255 - len(self.plot_curves)*10 % 255 ), width=2)
+                self.plot_curves[target_id] = self.plot_widget.plot(pen=pen_color, name=f"ID {target_id:X} - Byte 0")
+
+            arr = np.asarray(samples, dtype=np.float64) # shape (k, 2)
+            if len(arr) > MAX_PLOT_POINTS:
+                arr = arr[-MAX_PLOT_POINTS:] # Lô lớn hơn ring: chỉ giữ phần cuối
+            k = len(arr)
+
+            # Trục X là giây kể từ điểm đầu tiên — float64 nhỏ giữ độ chính xác
+            # và để clipToView/autorange làm việc với thời gian thật
+            if self._plot_t0 is None:
+                self._plot_t0 = arr[0, 0]
+            arr[:, 0] -= self._plot_t0
+
+            # Ghi đè vào ring buffer theo con trỏ ghi tăng đơn điệu,
+            # tách làm hai slice nếu lô vắt qua điểm quay vòng
+            buf_x = self.ring_x[target_id]
+            buf_y = self.ring_y[target_id]
+            idx = self.ring_idx[target_id]
+            pos = idx % MAX_PLOT_POINTS
+            split = min(k, MAX_PLOT_POINTS - pos)
+            buf_x[pos:pos + split] = arr[:split, 0]
+            buf_y[pos:pos + split] = arr[:split, 1]
+            if split < k:
+                buf_x[:k - split] = arr[split:, 0]
+                buf_y[:k - split] = arr[split:, 1]
+            self.ring_idx[target_id] = idx + k
 
         # Việc vẽ đồ thị thực tế sẽ được thực hiện trong self.update_plots bởi QTimer
 
@@ -525,12 +769,11 @@ class MainWindow(QMainWindow):
             is_remote = self.send_type_combo.currentIndex() == 1
 
             data_str = self.send_data_edit.text().strip()
-            data_bytes = bytearray()
+            data_bytes = b'' # bytes (không phải bytearray): hashable, cache được khi gửi lặp lại
             dlc = 0
             if not is_remote:
                  if data_str:
-                     hex_values = data_str.split()
-                     data_bytes = bytearray.fromhex("".join(hex_values))
+                     data_bytes = bytes.fromhex(_WS_RE.sub('', data_str))
                      dlc = len(data_bytes)
                      if dlc > 8: # Giả sử là CAN cổ điển, chưa hỗ trợ FD gửi
                          raise ValueError("Data length exceeds 8 bytes for standard CAN.")
@@ -549,8 +792,11 @@ class MainWindow(QMainWindow):
                 data=data_bytes if not is_remote else None
             )
 
-            # Phát tín hiệu yêu cầu gửi, worker sẽ thực hiện việc gửi
-            self.send_request.emit(message)
+            # Gửi trực tiếp không qua vòng queued-signal — bus.send nhả GIL
+            # nên không chặn thread RX. (self.send_request vẫn được kết nối
+            # làm đường dự phòng qua event loop nếu cần back-pressure.)
+            if self.can_worker:
+                self.can_worker.send_now(message)
             print(f"Requesting send: {message}") # Debug
 
             # (Tùy chọn) Thêm message đã gửi vào bảng hiển thị
@@ -578,8 +824,11 @@ class MainWindow(QMainWindow):
                 if not file_path.lower().endswith('.csv'):
                     file_path += '.csv'
 
-                self.log_file = open(file_path, 'w', newline='', encoding='utf-8')
+                # Buffer 64 KiB để giảm số syscall write
+                self.log_file = open(file_path, 'w', newline='', encoding='utf-8',
+                                     buffering=1 << 16)
                 self.csv_writer = csv.writer(self.log_file)
+                self._log_batch.clear()
                 # Viết header
                 self.csv_writer.writerow([
                     "Timestamp", "ID (Hex)", "ID Type", "Msg Type", "DLC", "Data (Hex)", "Count", "Bus"
@@ -601,6 +850,7 @@ class MainWindow(QMainWindow):
         if not self.is_logging:
             return
 
+        self._flush_log_batch() # Ghi nốt phần còn lại trước khi đóng file
         self.is_logging = False
         if self.log_file:
             try:
@@ -625,15 +875,23 @@ class MainWindow(QMainWindow):
     # --- Plotting ---
     def update_plots(self):
         """Cập nhật các đường cong trên đồ thị với dữ liệu đã thu thập."""
-        if not self.isVisible(): # Không cập nhật nếu cửa sổ bị ẩn
+        if not self.isVisible() or self.isMinimized(): # Không cập nhật nếu cửa sổ bị ẩn/thu nhỏ
              return
 
         for target_id, curve in self.plot_curves.items():
-            if target_id in self.plot_data_x and target_id in self.plot_data_y:
-                x_data = self.plot_data_x[target_id]
-                y_data = self.plot_data_y[target_id]
-                if x_data and y_data: # Chỉ cập nhật nếu có dữ liệu
-                    curve.setData(x=list(x_data), y=list(y_data)) # Chuyển sang list để pyqtgraph xử lý
+            idx = self.ring_idx.get(target_id, 0)
+            if idx == 0: # Chỉ cập nhật nếu có dữ liệu
+                continue
+            buf_x = self.ring_x[target_id]
+            buf_y = self.ring_y[target_id]
+            if idx <= MAX_PLOT_POINTS:
+                # Ring chưa đầy: slice liền mạch, không copy thừa
+                curve.setData(x=buf_x[:idx], y=buf_y[:idx])
+            else:
+                # Ring đã quay vòng: ghép hai đoạn thành mảng theo thứ tự thời gian
+                pos = idx % MAX_PLOT_POINTS
+                curve.setData(x=np.concatenate((buf_x[pos:], buf_x[:pos])),
+                              y=np.concatenate((buf_y[pos:], buf_y[:pos])))
 
     # --- Cleanup ---
     def closeEvent(self, event):
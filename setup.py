@@ -0,0 +1,14 @@
+"""Build extension Cython tùy chọn cho formatter per-message.
+
+    python setup.py build_ext --inplace
+
+Không bắt buộc — main_can_analyzer tự fallback về bản Python thuần nếu
+chưa build.
+"""
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="can_format",
+    ext_modules=cythonize("can_format.pyx"),
+)